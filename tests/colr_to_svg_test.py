@@ -52,8 +52,46 @@ SIMPLE_CPAL = [[(0, 0, 0, 1.0), (0, 0, 1, 1.0)]]
 MULTI_CPAL = [SIMPLE_CPAL[0], [(1, 0, 0, 1), (0, 1, 0, 1)]]
 
 
+def _glyph(draw_fn) -> _g_l_y_f.Glyph:
+    pen = TTGlyphPen(None)
+    draw_fn(pen)
+    return pen.glyph()
+
+
+# simple shapes to play with, shared by all the color glyphs under test
+MONOCHROME_GLYPHS = {"box": _glyph(_draw_box)}
+
+
+@pytest.fixture(scope="module")
+def minimal_font():
+    # create a minimal font to play with
+    font = ttLib.TTFont()
+    glyf_table = font["glyf"] = newTable("glyf")
+    glyf_table.glyphs = {".notdef": _g_l_y_f.Glyph()}
+    hmtx_table = font["hmtx"] = newTable("hmtx")
+    hmtx_table.metrics = {}
+    head_table = font["head"] = newTable("head")
+    head_table.unitsPerEm = 100
+    maxp_table = font["maxp"] = newTable("maxp")
+    maxp_table.numGlyphs = 1
+    colr_table = font["COLR"] = newTable("COLR")
+    colr_table.table = ot.COLR()
+
+    # provide some simple shapes to play with
+    font.setGlyphOrder(font.getGlyphOrder() + list(MONOCHROME_GLYPHS.keys()))
+    for glyph_name, glyph in MONOCHROME_GLYPHS.items():
+        # Add to glyf
+        glyf_table.glyphs[glyph_name] = glyph
+
+        # setup hmtx
+        glyph.recalcBounds(glyf_table)
+        hmtx_table.metrics[glyph_name] = (head_table.unitsPerEm, glyph.xMin)
+
+    return font
+
+
 @pytest.mark.parametrize(
-    "glyph_to_convert, color_glyphs, monochrome_glyphs, palettes, expected_svg",
+    "glyph_to_convert, color_glyphs, palettes, expected_svg",
     [
         # Solid filled box
         (
@@ -65,7 +103,6 @@ MULTI_CPAL = [SIMPLE_CPAL[0], [(1, 0, 0, 1), (0, 1, 0, 1)]]
                     "box",
                 ),
             },
-            {"box": _draw_box},
             SIMPLE_CPAL,
             """
             <svg xmlns="http://www.w3.org/2000/svg">
@@ -85,7 +122,6 @@ MULTI_CPAL = [SIMPLE_CPAL[0], [(1, 0, 0, 1), (0, 1, 0, 1)]]
                     "box",
                 ),
             },
-            {"box": _draw_box},
             SIMPLE_CPAL,
             """
             <svg xmlns="http://www.w3.org/2000/svg">
@@ -128,7 +164,6 @@ MULTI_CPAL = [SIMPLE_CPAL[0], [(1, 0, 0, 1), (0, 1, 0, 1)]]
                     },
                 },
             },
-            {"box": _draw_box},
             SIMPLE_CPAL,
             """
             <svg xmlns="http://www.w3.org/2000/svg">
@@ -168,7 +203,6 @@ MULTI_CPAL = [SIMPLE_CPAL[0], [(1, 0, 0, 1), (0, 1, 0, 1)]]
                     ),
                 },
             },
-            {"box": _draw_box},
             SIMPLE_CPAL,
             """
             <svg xmlns="http://www.w3.org/2000/svg">
@@ -187,7 +221,6 @@ MULTI_CPAL = [SIMPLE_CPAL[0], [(1, 0, 0, 1), (0, 1, 0, 1)]]
                     "box",
                 ),
             },
-            {"box": _draw_box},
             MULTI_CPAL,
             """
             <svg xmlns="http://www.w3.org/2000/svg">
@@ -199,38 +232,13 @@ MULTI_CPAL = [SIMPLE_CPAL[0], [(1, 0, 0, 1), (0, 1, 0, 1)]]
     ],
 )
 def test_colr_v1_paint_to_svg(
-    glyph_to_convert, color_glyphs, monochrome_glyphs, palettes, expected_svg
+    minimal_font, glyph_to_convert, color_glyphs, palettes, expected_svg
 ):
     actual_svg = SVG.fromstring('<svg xmlns="http://www.w3.org/2000/svg"><defs/></svg>')
     expected_svg = SVG.fromstring(textwrap.dedent(expected_svg))
 
-    # create a minimal font to play with
-    font = ttLib.TTFont()
-    glyf_table = font["glyf"] = newTable("glyf")
-    glyf_table.glyphs = {".notdef": _g_l_y_f.Glyph()}
-    hmtx_table = font["hmtx"] = newTable("hmtx")
-    hmtx_table.metrics = {}
-    head_table = font["head"] = newTable("head")
-    head_table.unitsPerEm = 100
-    maxp_table = font["maxp"] = newTable("maxp")
-    maxp_table.numGlyphs = 1
-    colr_table = font["COLR"] = newTable("COLR")
-    colr_table.table = ot.COLR()
-
-    # provide some simple shapes to play with
-    for glyph_name, draw_fn in monochrome_glyphs.items():
-        font.setGlyphOrder(font.getGlyphOrder() + [glyph_name])
-        pen = TTGlyphPen(None)
-        draw_fn(pen)
-        glyph = pen.glyph()
-        # Add to glyf
-        glyf_table.glyphs[glyph_name] = glyph
-
-        # setup hmtx
-        glyph.recalcBounds(glyf_table)
-        hmtx_table.metrics[glyph_name] = (head_table.unitsPerEm, glyph.xMin)
-
-    print(hmtx_table.metrics)
+    font = minimal_font
+    colr_table = font["COLR"]
 
     font["CPAL"] = buildCPAL(palettes)
 
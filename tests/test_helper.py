@@ -12,14 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent.futures import ThreadPoolExecutor
 import difflib
+from functools import lru_cache
 import io
+import itertools
 import os
 import re
 import shutil
 import subprocess
 import sys
-from lxml import etree
 from fontTools import ttLib
 from nanoemoji import codepoints
 from nanoemoji import config
@@ -28,29 +30,49 @@ from nanoemoji.glyph import glyph_name
 from nanoemoji import write_font
 from nanoemoji.png import PNG
 from pathlib import Path
+from typing import Dict, Iterable
 from picosvg.svg import SVG
 import pytest
 import shutil
 import tempfile
 
 
+@lru_cache(maxsize=1)
 def test_data_dir() -> Path:
     return Path(__file__).parent
 
 
+@lru_cache(maxsize=None)
 def locate_test_file(filename) -> Path:
     return test_data_dir() / filename
 
 
+@lru_cache(maxsize=512)
+def _parse_svg_cached(path: Path, mtime_ns: int, topicosvg: bool) -> str:
+    svg = SVG.parse(path)
+    # Don't skip this for svgs that already pass checkpicosvg(), topicosvg still
+    # rewrites some of them (absolute paths, rounding, opacity, ...)
+    if topicosvg:
+        svg.topicosvg(inplace=True)
+    return svg.tostring()
+
+
 def parse_svg(filename, locate=False, topicosvg=True):
     if locate:
         filename = locate_test_file(filename)
-    svg = SVG.parse(filename)
-    return svg.topicosvg(inplace=True) if topicosvg else svg
+    path = Path(filename).resolve()
+    # cache the serialized svg, topicosvg(inplace=True) and friends mutate the tree
+    svg_str = _parse_svg_cached(path, path.stat().st_mtime_ns, topicosvg)
+    return SVG.fromstring(svg_str)
+
+
+@lru_cache(maxsize=1)
+def _resvg_path():
+    return shutil.which("resvg")
 
 
 def rasterize_svg(input_file: Path, output_file: Path, resolution: int = 128) -> PNG:
-    resvg = shutil.which("resvg")
+    resvg = _resvg_path()
     if not resvg:
         pytest.skip("resvg not installed")
     result = subprocess.run(
@@ -67,6 +89,55 @@ def rasterize_svg(input_file: Path, output_file: Path, resolution: int = 128) ->
     return PNG.read_from(output_file)
 
 
+def _map_svgs(fn, svgs):
+    # starting threads isn't worth it for the one or two svgs most tests use
+    if len(svgs) <= 2:
+        return [fn(svg) for svg in svgs]
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        return list(executor.map(fn, svgs))
+
+
+# (resolved svg path, mtime_ns, resolution) => PNG
+_RASTERIZED_SVGS = {}
+
+
+def rasterize_svgs(
+    input_files: Iterable[Path], output_dir: Path, resolution: int = 128
+) -> Dict[Path, PNG]:
+    """Rasterize input_files to output_dir/{stem}.png.
+
+    resvg runs concurrently for svgs not already rasterized this session; svgs
+    seen before just have their cached png copied to output_dir.
+    """
+    if not _resvg_path():
+        pytest.skip("resvg not installed")
+
+    def _output_file(input_file):
+        return output_dir / (input_file.stem + ".png")
+
+    input_files = tuple(input_files)
+    keys = {f: (f.resolve(), f.stat().st_mtime_ns, resolution) for f in input_files}
+    missing = {}
+    for input_file in input_files:
+        if keys[input_file] not in _RASTERIZED_SVGS:
+            missing.setdefault(keys[input_file], input_file)
+
+    if missing:
+        pngs = _map_svgs(
+            lambda f: rasterize_svg(f, _output_file(f), resolution),
+            tuple(missing.values()),
+        )
+        _RASTERIZED_SVGS.update(zip(missing.keys(), pngs))
+
+    result = {}
+    for input_file in input_files:
+        png = _RASTERIZED_SVGS[keys[input_file]]
+        if keys[input_file] not in missing:
+            _output_file(input_file).write_bytes(png)
+        result[input_file] = png
+    return result
+
+
 def color_font_config(
     config_overrides,
     svgs,
@@ -102,22 +173,18 @@ def color_font_config(
 
     svg_inputs = [(None, None)] * len(svgs)
     if has_svgs:
-        svg_inputs = [
-            (Path(os.path.relpath(svg)), parse_svg(svg, topicosvg=has_picosvgs))
-            for svg in svgs
-        ]
+        svg_inputs = _map_svgs(
+            lambda svg: (
+                Path(os.path.relpath(svg)),
+                parse_svg(svg, topicosvg=has_picosvgs),
+            ),
+            svgs,
+        )
 
     bitmap_inputs = [(None, None)] * len(svgs)
     if has_bitmaps:
-        bitmap_inputs = [
-            (
-                tmp_dir / (svg.stem + ".png"),
-                rasterize_svg(
-                    svg, tmp_dir / (svg.stem + ".png"), font_config.bitmap_resolution
-                ),
-            )
-            for svg in svgs
-        ]
+        bitmaps = rasterize_svgs(svgs, tmp_dir, font_config.bitmap_resolution)
+        bitmap_inputs = [(tmp_dir / (svg.stem + ".png"), bitmaps[svg]) for svg in svgs]
 
     if glyphname_fn is None:
 
@@ -155,34 +222,44 @@ def _save_actual_ttx(expected_ttx, ttx_content):
     return tmp_file
 
 
-def _strip_inline_bitmaps(ttx_content):
-    parser = etree.XMLParser(strip_cdata=False)
-    root = etree.fromstring(bytes(ttx_content, encoding="utf-8"), parser=parser)
-    made_changes = False
+_TTLIB_VERSION_RE = re.compile(r'\s+ttLibVersion="[^"]+"')
+# one scan of the ttx finds both the sbix table and any extfile bitmaps
+_INLINE_BITMAPS_RE = re.compile(
+    r"(?P<sbix><sbix>.*?</sbix>)"
+    r'|(?P<imagedata_start><extfileimagedata value=")(?P<imagedata_value>[^"]*)',
+    re.DOTALL,
+)
+_SBIX_HEXDATA_RE = re.compile(
+    r"<glyph\b(?P<attrs>[^>]*)>\s*<hexdata>.*?</hexdata>\s*</glyph>", re.DOTALL
+)
+_XML_ATTR_RE = re.compile(r'(?P<name>[\w:.-]+)="(?P<value>[^"]*)"')
+
+
+def _strip_sbix_hexdata(match):
+    attrs = dict(_XML_ATTR_RE.findall(match.group("attrs")))
+    text = (attrs["name"] + "." + attrs["graphicType"]).strip()
+    return f"<glyph{match.group('attrs')}>{text}</glyph>"
 
+
+def _strip_inline_bitmap(match):
     # bitmapGlyphDataFormat="extfile" doesn't work for sbix so wipe those manually
-    for hexdata in root.xpath("//sbix/strike/glyph/hexdata"):
-        glyph = hexdata.getparent()
-        glyph.remove(hexdata)
-        glyph.text = (glyph.attrib["name"] + "." + glyph.attrib["graphicType"]).strip()
-        made_changes = True
+    if match.group("sbix") is not None:
+        return _SBIX_HEXDATA_RE.sub(_strip_sbix_hexdata, match.group("sbix"))
 
     # Windows gives \ instead of /, if we see that flip it
-    for imagedata in root.xpath("//extfileimagedata"):
-        imagedata.attrib["value"] = Path(imagedata.attrib["value"]).name
-        made_changes = True
+    return match.group("imagedata_start") + Path(match.group("imagedata_value")).name
 
-    if not made_changes:
-        return ttx_content
 
-    actual_ttx = io.BytesIO()
-    etree.ElementTree(root).write(actual_ttx, encoding="utf-8")
-    # Glue on the *exact* xml decl and wrapping newline saveXML produces
-    return (
-        '<?xml version="1.0" encoding="UTF-8"?>\n'
-        + actual_ttx.getvalue().decode("utf-8")
-        + "\n"
-    )
+def _strip_inline_bitmaps(ttx_content):
+    return _INLINE_BITMAPS_RE.sub(_strip_inline_bitmap, ttx_content)
+
+
+_MAX_TTX_DIFF_LINES = 500
+
+
+@lru_cache(maxsize=256)
+def _read_expected_ttx(path: Path, mtime_ns: int) -> str:
+    return path.read_text()
 
 
 def assert_expected_ttx(
@@ -204,28 +281,34 @@ def assert_expected_ttx(
     )
 
     # Elide ttFont attributes because ttLibVersion may change
-    actual = re.sub(r'\s+ttLibVersion="[^"]+"', "", actual_ttx.getvalue())
+    actual = _TTLIB_VERSION_RE.sub("", actual_ttx.getvalue())
 
     actual = _strip_inline_bitmaps(actual)
 
     expected_location = locate_test_file(expected_ttx)
-    if os.path.isfile(expected_location):
-        with open(expected_location) as f:
-            expected = f.read()
-    else:
+    try:
+        expected = _read_expected_ttx(
+            expected_location, expected_location.stat().st_mtime_ns
+        )
+    except FileNotFoundError:
         tmp_file = _save_actual_ttx(expected_ttx, actual)
         raise FileNotFoundError(
             f"Missing expected in {expected_location}. Actual in {tmp_file}"
         )
 
     if actual != expected:
-        for line in difflib.unified_diff(
+        diff = difflib.unified_diff(
             expected.splitlines(keepends=True),
             actual.splitlines(keepends=True),
             fromfile=f"{expected_ttx} (expected)",
             tofile=f"{expected_ttx} (actual)",
-        ):
-            sys.stderr.write(line)
+        )
+        # the full diff of a large font is both slow and unreadable, the
+        # complete actual ttx is saved below anyway
+        diff_lines = list(itertools.islice(diff, _MAX_TTX_DIFF_LINES + 1))
+        if len(diff_lines) > _MAX_TTX_DIFF_LINES:
+            diff_lines[-1] = f"... diff truncated to {_MAX_TTX_DIFF_LINES} lines\n"
+        sys.stderr.write("".join(diff_lines))
         print(f"SVGS: {svgs}")
         tmp_file = _save_actual_ttx(expected_ttx, actual)
         pytest.fail(f"{tmp_file} != {expected_ttx}")
@@ -233,35 +316,28 @@ def assert_expected_ttx(
 
 # Copied from picosvg
 def drop_whitespace(svg):
-    svg._update_etree()
-    for el in svg.svg_root.iter("*"):
-        if el.text is not None:
-            el.text = el.text.strip()
-        if el.tail is not None:
-            el.tail = el.tail.strip()
-
-
-# Copied from picosvg
-def pretty_print(svg_tree):
     def _reduce_text(text):
         text = text.strip() if text else None
         return text if text else None
 
     # lxml really likes to retain whitespace
-    for e in svg_tree.iter("*"):
-        e.text = _reduce_text(e.text)
-        e.tail = _reduce_text(e.tail)
-
-    return etree.tostring(svg_tree, pretty_print=True).decode("utf-8")
+    svg._update_etree()
+    for el in svg.svg_root.iter("*"):
+        el.text = _reduce_text(el.text)
+        el.tail = _reduce_text(el.tail)
 
 
 # Copied from picosvg
 def svg_diff(actual_svg: SVG, expected_svg: SVG):
     drop_whitespace(actual_svg)
     drop_whitespace(expected_svg)
-    print(f"A: {pretty_print(actual_svg.toetree())}")
-    print(f"E: {pretty_print(expected_svg.toetree())}")
-    assert actual_svg.tostring() == expected_svg.tostring()
+    actual_str = actual_svg.tostring()
+    expected_str = expected_svg.tostring()
+    if actual_str == expected_str:
+        return
+    print(f"A: {actual_svg.tostring(pretty_print=True)}")
+    print(f"E: {expected_svg.tostring(pretty_print=True)}")
+    assert actual_str == expected_str
 
 
 def run(cmd):